@@ -1,7 +1,3 @@
-import os
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import pandas as pd
 from utils.data_fetcher import DataFetcher
 from utils.tushare_loader import TushareLoader
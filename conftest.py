@@ -0,0 +1,5 @@
+"""测试入口配置：将仓库根目录加入sys.path一次，测试文件直接import utils包"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
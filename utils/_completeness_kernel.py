@@ -0,0 +1,95 @@
+"""
+数据完整性检查的数值内核
+
+将"必备列是否含NaN"与"交易日是否缺失"两个检查融合为单趟循环。
+安装了numba时JIT编译为机器码执行；未安装时退化为等价的NumPy实现，
+调用方无需感知差异
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+def _check_kernel(numeric, df_dates_i8, trading_i8):
+    """
+    单趟扫描数值块与有序日期数组
+
+    Args:
+        numeric: (N, K)的float64数值块（必备列）
+        df_dates_i8: 升序排列的int64日期键（数据中的交易日，YYYYMMDD）
+        trading_i8: 升序排列的int64日期键（日历中的交易日，YYYYMMDD）
+
+    Returns:
+        (has_nan, has_missing_day): 是否存在NaN、是否缺失交易日
+    """
+    has_nan = False
+    n_rows, n_cols = numeric.shape
+    for i in range(n_rows):
+        for j in range(n_cols):
+            if np.isnan(numeric[i, j]):
+                has_nan = True
+                break
+        if has_nan:
+            break
+
+    # 两个有序数组做归并式比对：日历中的每个交易日都应出现在数据中
+    has_missing_day = False
+    pos = 0
+    for k in range(trading_i8.size):
+        target = trading_i8[k]
+        while pos < df_dates_i8.size and df_dates_i8[pos] < target:
+            pos += 1
+        if pos >= df_dates_i8.size or df_dates_i8[pos] != target:
+            has_missing_day = True
+            break
+
+    return has_nan, has_missing_day
+
+
+def _check_numpy(numeric, df_dates_i8, trading_i8):
+    """无numba时的等价NumPy实现"""
+    has_nan = bool(np.isnan(numeric).any())
+    if trading_i8.size == 0:
+        return has_nan, False
+    has_missing_day = not bool(np.isin(trading_i8, df_dates_i8).all())
+    return has_nan, has_missing_day
+
+
+def _diff_kernel(a, b, atol):
+    """
+    逐行比对两个(N, K)float64矩阵，返回"该行存在超差"的布尔掩码
+
+    NaN对NaN视为相等（下载与库内同缺）；单边NaN视为冲突。
+    内层循环遇到首个超差即短路，无需整行算完
+    """
+    n_rows, n_cols = a.shape
+    out = np.zeros(n_rows, dtype=np.bool_)
+    for i in range(n_rows):
+        for j in range(n_cols):
+            va = a[i, j]
+            vb = b[i, j]
+            a_nan = np.isnan(va)
+            b_nan = np.isnan(vb)
+            if a_nan and b_nan:
+                continue
+            if a_nan != b_nan or abs(va - vb) > atol:
+                out[i] = True
+                break
+    return out
+
+
+def _diff_numpy(a, b, atol):
+    """无numba时的等价NumPy实现"""
+    return ~np.isclose(a, b, rtol=0.0, atol=atol, equal_nan=True).all(axis=1)
+
+
+if _HAS_NUMBA:
+    check_completeness = njit(cache=True)(_check_kernel)
+    diff_mask = njit(cache=True)(_diff_kernel)
+else:
+    check_completeness = _check_numpy
+    diff_mask = _diff_numpy
@@ -0,0 +1,35 @@
+"""
+配置加载：统一入口 + 进程内缓存
+
+同一份config.yaml在每个TushareLoader/DatabaseInitializer构造时都会
+重新解析；这里按路径缓存解析结果，并在装有libyaml时使用C实现的
+CSafeLoader（比纯Python加载器快约10倍）
+"""
+import os
+from functools import lru_cache
+
+import yaml
+
+# libyaml编译进PyYAML时优先用C加载器
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@lru_cache(maxsize=8)
+def _parse_config(abs_path: str, mtime: float) -> dict:
+    """按(绝对路径, mtime)缓存解析结果：文件被改动后自动失效"""
+    with open(abs_path, 'r') as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
+
+
+def load_config(config_path: str) -> dict:
+    """
+    解析并缓存YAML配置文件
+
+    Args:
+        config_path: 配置文件路径
+
+    Returns:
+        dict: 配置内容（缓存共享，调用方不应原地修改）
+    """
+    abs_path = os.path.abspath(config_path)
+    return _parse_config(abs_path, os.path.getmtime(abs_path))
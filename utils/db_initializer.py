@@ -1,18 +1,18 @@
 import sqlite3
 import os
-import yaml
 from typing import Optional
 
+from .config_loader import load_config
+
 class DatabaseInitializer:
     def __init__(self, config_path: str = '../Config/config.yaml'):
         """
         初始化数据库初始化器
-        
+
         Args:
             config_path: 配置文件路径
         """
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(config_path)
         
         self.history_db_path = self.config.get('database_path', '../Database/history.db')
         self.test_db_path = '../Database/test.db'
@@ -39,9 +39,11 @@ class DatabaseInitializer:
         # 创建数据库连接
         with sqlite3.connect(db_path) as conn:
             # 创建daily_data表
+            # trade_date存为INTEGER（YYYYMMDD）：整数比较比文本排序规则更省，
+            # 且B树页占用更小；Python边界负责int与字符串的互转
             create_daily_data_sql = """
             CREATE TABLE IF NOT EXISTS daily_data (
-                trade_date TEXT NOT NULL,
+                trade_date INTEGER NOT NULL,
                 ts_code TEXT NOT NULL,
                 open REAL,
                 high REAL,
@@ -66,7 +68,16 @@ class DatabaseInitializer:
             );
             """
             conn.execute(create_moneyflow_data_sql)
-            
+
+            # 为"按股票代码+日期范围"的查询建立复合索引：
+            # WHERE ts_code = ? AND trade_date BETWEEN ... 变成B树前缀范围扫描，
+            # 且ORDER BY trade_date可直接利用索引顺序免排序
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_daily_code_date ON daily_data(ts_code, trade_date)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_moneyflow_code_date ON moneyflow_data(ts_code, trade_date)")
+
+            # 收集统计信息，让查询计划器选用新索引
+            conn.execute("ANALYZE")
+
             conn.commit()
             
             print(f"✅ 数据库 {os.path.basename(db_path)} 初始化完成")
@@ -0,0 +1,89 @@
+"""
+Parquet列式缓存：SQLite仍是权威的写入存储，读多写少的分析路径优先走列存。
+
+每只股票一个分区文件（<cache_dir>/<ts_code>.parquet，zstd压缩）。
+装有duckdb时用SQL谓词下推读取（只解压命中的行组和列）；
+未安装时退回pandas的filters行组过滤，行为一致。
+"""
+import os
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class ParquetCache:
+    def __init__(self, cache_dir: str = '../Database/cache'):
+        """
+        初始化Parquet缓存
+
+        Args:
+            cache_dir: 缓存目录路径
+        """
+        self.cache_dir = cache_dir
+
+    def path_for(self, ts_code: str) -> str:
+        """单只股票的Parquet缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{ts_code}.parquet")
+
+    def read(self, ts_code: str, start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        尝试从Parquet缓存读取指定区间的数据
+
+        Returns:
+            Optional[pd.DataFrame]: 命中返回数据（按trade_date升序），
+                未命中或读取失败返回None
+        """
+        path = self.path_for(ts_code)
+        if not os.path.exists(path):
+            return None
+        try:
+            if duckdb is not None:
+                df = self._read_duckdb(path, start_date, end_date)
+            else:
+                filters = []
+                if start_date:
+                    filters.append(('trade_date', '>=', start_date))
+                if end_date:
+                    filters.append(('trade_date', '<=', end_date))
+                df = pd.read_parquet(path, filters=filters or None)
+        except Exception as e:
+            print(f"⚠️ Parquet缓存读取失败：{str(e)}")
+            return None
+        if df.empty:
+            return None
+        return df.sort_values('trade_date').reset_index(drop=True)
+
+    def _read_duckdb(self, path: str, start_date: Optional[str],
+                     end_date: Optional[str]) -> pd.DataFrame:
+        """duckdb读取路径：日期谓词下推到Parquet行组统计信息，免整文件解压"""
+        query = "SELECT * FROM read_parquet(?)"
+        params = [path]
+        conds = []
+        if start_date:
+            conds.append("trade_date >= ?")
+            params.append(start_date)
+        if end_date:
+            conds.append("trade_date <= ?")
+            params.append(end_date)
+        if conds:
+            query += " WHERE " + " AND ".join(conds)
+        return duckdb.execute(query, params).df()
+
+    def write(self, ts_code: str, df: pd.DataFrame):
+        """将股票数据合并进Parquet缓存（与已有缓存去重后整体重写）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path_for(ts_code)
+            if os.path.exists(path):
+                existing = pd.read_parquet(path)
+                df = pd.concat([existing, df]).drop_duplicates(subset=['trade_date', 'ts_code'])
+            df = df.sort_values('trade_date')
+            df.to_parquet(path, compression='zstd', index=False)
+        except Exception as e:
+            print(f"⚠️ Parquet缓存写入失败：{str(e)}")
@@ -1,41 +1,144 @@
 import tushare as ts
 import pandas as pd
-import yaml
-from typing import Optional, Tuple
+import numpy as np
 import os
-import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from ._completeness_kernel import diff_mask
+from .config_loader import load_config
+from .db_manager import DatabaseManager
+
+# 股票基本信息的磁盘缓存路径（低频变动的参考表，按天过期）
+_STOCK_BASIC_CACHE_PATH = '../Database/cache/stock_basic.parquet'
+
+# 交易日历/复权因子的磁盘缓存：进程内LRU只活一个进程的寿命，
+# parquet落盘后重启进程、跨worker都能命中，免去重复HTTP请求
+_TRADE_CAL_CACHE_DIR = '../Database/cache/trade_cal'
+_ADJ_FACTOR_CACHE_DIR = '../Database/cache/adj_factor'
+_DISK_CACHE_TTL = 86400
+
+
+def _read_cached_parquet(path: str) -> Optional[pd.DataFrame]:
+    """读取磁盘parquet缓存；文件不存在或超过TTL时返回None（回源下载）"""
+    try:
+        if not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > _DISK_CACHE_TTL:
+            return None
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(f"⚠️ 磁盘缓存读取失败（忽略并回源）：{path} - {str(e)}")
+        return None
+
+
+def _write_cached_parquet(path: str, df: pd.DataFrame):
+    """写入磁盘parquet缓存（写失败只告警，不影响主流程）"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, index=False)
+    except Exception as e:
+        print(f"⚠️ 磁盘缓存写入失败：{path} - {str(e)}")
+
+# Tushare接口限流：每分钟最多请求次数（进程内全局，所有loader实例共享）
+_API_RATE_LIMIT = 200
+_api_call_times: deque = deque()
+_api_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _pro_api():
+    """缓存的pro_api客户端（进程内一份）：每次调用都重建客户端纯属浪费"""
+    return ts.pro_api()
+
+
+@lru_cache(maxsize=256)
+def _download_trading_calendar(start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    下载并缓存交易日历（进程内LRU，按日期区间为键）
+
+    同一区间的重复调用直接命中内存，不再发起HTTP请求；
+    历史日历不会变化，无需过期策略。内存未命中时先查磁盘缓存
+    （按天过期，覆盖未来区间的日历可能调整的情况）
+    """
+    cache_path = os.path.join(_TRADE_CAL_CACHE_DIR, f"{start_date}_{end_date}.parquet")
+    cached = _read_cached_parquet(cache_path)
+    if cached is not None:
+        return cached
+
+    _acquire_api_slot()
+    df = _pro_api().trade_cal(exchange='SSE', start_date=start_date, end_date=end_date)
+
+    # 检查数据有效性
+    if df is None or df.empty:
+        raise ValueError(f"无法获取交易日历: {start_date} 到 {end_date}")
+
+    # 检查必要的列是否存在
+    required_columns = ['cal_date', 'is_open']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"交易日历数据缺少必要的列: {', '.join(missing_columns)}")
+
+    # 只保留交易日（is_open=1）：numpy掩码切片，省掉中间布尔Series
+    open_days = df.loc[df['is_open'].to_numpy() == 1]
+    _write_cached_parquet(cache_path, open_days)
+    return open_days
+
+
+def _acquire_api_slot():
+    """
+    令牌桶限流：在发起Tushare请求前调用，阻塞到最近一分钟内的
+    请求数低于上限为止。在源头限制提交速率，而不是靠消费端sleep——
+    后者只能拖慢结果处理，所有请求其实早已同时打到API
+    """
+    while True:
+        with _api_lock:
+            now = time.monotonic()
+            while _api_call_times and now - _api_call_times[0] >= 60.0:
+                _api_call_times.popleft()
+            if len(_api_call_times) < _API_RATE_LIMIT:
+                _api_call_times.append(now)
+                return
+            wait = 60.0 - (now - _api_call_times[0])
+        time.sleep(wait)
 
-# Add parent directory to path if running directly
-if __name__ == "__main__":
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from utils.db_manager import DatabaseManager
-else:
-    from .db_manager import DatabaseManager
 
 class TushareLoader:
-    def __init__(self, config_path: str = '../Config/config.yaml', db_path: Optional[str] = None):
+    def __init__(self, config_path: str = '../Config/config.yaml', db_path: Optional[str] = None,
+                 db_manager: Optional[DatabaseManager] = None):
         """
         Initialize TushareLoader with configuration
-        
+
         Args:
             config_path: Path to the config file containing Tushare token and other settings
             db_path: Path to the database file (optional, defaults to history.db)
+            db_manager: Existing DatabaseManager to share (optional, takes precedence
+                over db_path so callers can reuse one connection pool)
         """
-        # Load configuration
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
-        
+        # Load configuration（解析结果按路径缓存，重复构造loader不再重新解析）
+        self.config = load_config(config_path)
+
         # Initialize Tushare
         ts.set_token(self.config['tushare_token'])
-        
+
         # Set default date range
         self.start_date = self.config.get('start_date', '20240101')
         self.end_date = self.config.get('end_date', '20240501')
-        
-        # Initialize database manager with specified or default path
-        if db_path is None:
-            db_path = '../Database/history.db'
-        self.db_manager = DatabaseManager(db_path=db_path)
+
+        # Share the caller's database manager when given, otherwise build one
+        if db_manager is None:
+            if db_path is None:
+                db_path = '../Database/history.db'
+            db_manager = DatabaseManager(db_path=db_path)
+        self.db_manager = db_manager
+
+        # 复权因子缓存：{(ts_code, start, end): DataFrame}，
+        # 全量历史存在(ts_code, None, None)键下供区间切片
+        self._adj_cache: dict = {}
     
     def get_trading_calendar(self, start_date: str, end_date: str) -> pd.DataFrame:
         """
@@ -49,24 +152,9 @@ class TushareLoader:
             pd.DataFrame: 包含交易日历的DataFrame，包含所有必要的列（cal_date, is_open等）
         """
         try:
-            # 调用Tushare的交易日历接口
-            df = ts.pro_api().trade_cal(exchange='SSE', start_date=start_date, end_date=end_date)
-            
-            # 检查数据有效性
-            if df is None or df.empty:
-                raise ValueError(f"无法获取交易日历: {start_date} 到 {end_date}")
-            
-            # 检查必要的列是否存在
-            required_columns = ['cal_date', 'is_open']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"交易日历数据缺少必要的列: {', '.join(missing_columns)}")
-            
-            # 只保留交易日（is_open=1）
-            df = df[df['is_open'] == 1]
-            
-            return df
-            
+            # 相同区间的重复请求命中进程内LRU缓存（见_download_trading_calendar）
+            return _download_trading_calendar(start_date, end_date)
+
         except Exception as e:
             raise ValueError(f"获取交易日历失败: {str(e)}")
     
@@ -87,9 +175,25 @@ class TushareLoader:
             # Use provided dates or defaults
             start = start_date or self.start_date
             end = end_date or self.end_date
-            
+
+            # 请求窗口已被数据库完整覆盖时直接短路，两次HTTP往返都省掉
+            # （日历本身有进程内+磁盘缓存，批量下载时同一区间只取一次）
+            try:
+                expected_days = len(self.get_trading_calendar(start, end))
+                if expected_days > 0:
+                    with self.db_manager.get_connection() as conn:
+                        covered = conn.execute(
+                            "SELECT COUNT(DISTINCT trade_date) FROM daily_data "
+                            "WHERE ts_code = ? AND trade_date BETWEEN ? AND ?",
+                            (ts_code, int(start), int(end))).fetchone()[0]
+                    if covered >= expected_days:
+                        return True, f"✅ 数据库已完整覆盖: {ts_code} ({start} 到 {end})，跳过下载", pd.DataFrame()
+            except Exception as precheck_error:
+                print(f"⚠️ 覆盖预检失败（继续下载）：{str(precheck_error)}")
+
             # Download data
             try:
+                _acquire_api_slot()
                 df = ts.pro_bar(ts_code=ts_code, start_date=start, end_date=end, adj=None)
                 if df is None:
                     return False, f"❌ API返回空数据: {ts_code}", pd.DataFrame()
@@ -108,67 +212,76 @@ class TushareLoader:
 
             # 合并复权因子
             try:
-                df = df.merge(adj_factors, on=['trade_date', 'ts_code'], how='left')
+                # 单只股票下载，两侧ts_code恒等：用map按trade_date查表赋值，
+                # 不走merge的整帧重建
+                df['adj_factor'] = df['trade_date'].map(
+                    adj_factors.set_index('trade_date')['adj_factor'])
                 
-                # 检查合并后是否有缺失的复权因子
-                if df['adj_factor'].isnull().any():
-                    missing_dates = df[df['adj_factor'].isnull()]['trade_date'].tolist()
-                    print(f"⚠️ 警告：以下日期缺少复权因子：{', '.join(missing_dates)}")
+                # 检查合并后是否有缺失的复权因子：掩码只算一次，
+                # 正常路径（无缺失）不再物化日期列表
+                missing_mask = df['adj_factor'].isna().to_numpy()
+                if missing_mask.any():
+                    missing_dates = df['trade_date'].to_numpy()[missing_mask]
+                    shown = ', '.join(missing_dates[:20])
+                    more = len(missing_dates) - 20
+                    if more > 0:
+                        shown += f" ...（另有{more}个）"
+                    print(f"⚠️ 警告：以下日期缺少复权因子：{shown}")
                 
                 # 更新列选择以包括 adj_factor
                 df = df[["trade_date", "ts_code", "open", "high", "low", "close", "vol", "amount", "adj_factor"]]
-                df = df.sort_values("trade_date")
+                # pro_bar按日期倒序返回，近乎有序的数据用稳定归并排序接近线性；
+                # ignore_index顺手重建行号，省一列旧索引
+                df = df.sort_values("trade_date", kind="mergesort", ignore_index=True)
             except Exception as merge_error:
                 return False, f"❌ 数据合并失败: {ts_code} - {str(merge_error)}", pd.DataFrame()
-            
-            new_records = []
-            
+
+            value_cols = ["open", "high", "low", "close", "vol", "amount", "adj_factor"]
+
+            # API返回偶见object列：一次C层转换成float64，
+            # 之后的isclose在连续数组上跑而不是逐个拆箱Python float
+            df[value_cols] = df[value_cols].astype(np.float64, copy=False)
+
             try:
-                with self.db_manager.get_connection() as conn:
-                    for _, row in df.iterrows():
-                        trade_date = row["trade_date"]
-                        
-                        # Check for existing record
-                        existing = conn.execute("""
-                            SELECT trade_date, ts_code, open, high, low, close, vol, amount, adj_factor 
-                            FROM daily_data
-                            WHERE ts_code = ? AND trade_date = ?
-                        """, (ts_code, trade_date)).fetchone()
-                        
-                        if existing:
-                            # 将查询结果转换为字典，使用列名访问
-                            existing_dict = dict(zip(['trade_date', 'ts_code', 'open', 'high', 'low', 'close', 'vol', 'amount', 'adj_factor'], existing))
-                            
-                            # Compare fields
-                            db_row = {
-                                "open": round(float(existing_dict['open']), 6),
-                                "high": round(float(existing_dict['high']), 6),
-                                "low": round(float(existing_dict['low']), 6),
-                                "close": round(float(existing_dict['close']), 6),
-                                "vol": round(float(existing_dict['vol']), 6),
-                                "amount": round(float(existing_dict['amount']), 6),
-                                "adj_factor": round(float(existing_dict['adj_factor']), 6)
-                            }
-                            
-                            mem_row = {
-                                "open": round(float(row["open"]), 6),
-                                "high": round(float(row["high"]), 6),
-                                "low": round(float(row["low"]), 6),
-                                "close": round(float(row["close"]), 6),
-                                "vol": round(float(row["vol"]), 6),
-                                "amount": round(float(row["amount"]), 6),
-                                "adj_factor": round(float(row["adj_factor"]), 6)
-                            }
-                            
-                            if db_row != mem_row:
-                                return False, f"⚠️ 数据冲突：{ts_code} {trade_date} 不一致，数据库={db_row}, 下载={mem_row}", pd.DataFrame()
-                        else:
-                            new_records.append(row)
-                    
+                with self.db_manager.get_write_connection() as conn:
+                    # 单条范围查询一次取回库内已有行，pandas合并后向量化比对：
+                    # 逐行SELECT的N次语句准备+往返收敛为1次
+                    existing = pd.read_sql_query(
+                        "SELECT trade_date, open, high, low, close, vol, amount, adj_factor "
+                        "FROM daily_data WHERE ts_code = ? AND trade_date BETWEEN ? AND ?",
+                        conn, params=(ts_code, int(start), int(end)))
+                    existing['trade_date'] = existing['trade_date'].astype(str)
+
+                    # validate触发两侧键唯一性快检，歧义连接的去重逻辑直接跳过
+                    merged = df.merge(existing, on="trade_date", how="left",
+                                      suffixes=("", "_db"), indicator=True,
+                                      validate="one_to_one")
+                    in_db = (merged['_merge'] == 'both').to_numpy()
+
+                    # 向量化等值比对（atol对应原先round到6位的精度）；
+                    # 装有numba时diff_mask走JIT内核并在首个超差列短路
+                    new_vals = merged[value_cols].to_numpy(dtype=np.float64)
+                    db_vals = merged[[c + '_db' for c in value_cols]].to_numpy(dtype=np.float64)
+
+                    conflict = in_db & diff_mask(new_vals, db_vals, 1e-6)
+                    if conflict.any():
+                        row = merged.loc[conflict].iloc[0]
+                        db_row = {c: round(float(row[c + '_db']), 6) for c in value_cols}
+                        mem_row = {c: round(float(row[c]), 6) for c in value_cols}
+                        return False, f"⚠️ 数据冲突：{ts_code} {row['trade_date']} 不一致，数据库={db_row}, 下载={mem_row}", pd.DataFrame()
+
                     # Insert new records
-                    if new_records:
-                        insert_df = pd.DataFrame(new_records)
-                        insert_df.to_sql("daily_data", conn, if_exists="append", index=False)
+                    if not in_db.all():
+                        insert_df = df.loc[~in_db]
+                        # 按表结构排列列顺序，使用executemany在单个事务内批量插入，
+                        # 避免to_sql逐行INSERT的SQL解析和fsync开销
+                        insert_df = insert_df[["trade_date", "ts_code", "open", "high", "low", "close", "vol", "amount", "adj_factor"]]
+                        conn.execute("BEGIN")
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO daily_data (trade_date, ts_code, open, high, low, close, vol, amount, adj_factor) VALUES (?,?,?,?,?,?,?,?,?)",
+                            insert_df.itertuples(index=False, name=None)
+                        )
+                        conn.commit()
                         return True, f"✅ 插入 {len(insert_df)} 条新记录：{ts_code}", insert_df
                     else:
                         return True, f"✅ 无需插入，数据一致：{ts_code}", df
@@ -178,6 +291,59 @@ class TushareLoader:
         except Exception as e:
             return False, f"❌ 未知错误：{str(e)}", pd.DataFrame()
 
+    def download_many(self, ts_codes: list, start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, max_workers: int = 8) -> Tuple[bool, str, dict]:
+        """
+        并发下载多只股票并入库
+
+        瓶颈在Tushare的HTTP往返：线程池并行发起网络请求（受全局
+        令牌桶限流），写入统一经专用写连接自然串行，互不阻塞下载
+
+        Args:
+            ts_codes: 股票代码列表
+            start_date: 开始日期，格式YYYYMMDD（可选）
+            end_date: 结束日期，格式YYYYMMDD（可选）
+            max_workers: 最大并发下载数
+
+        Returns:
+            Tuple[bool, str, dict]: (success status, message, {ts_code: DataFrame})
+        """
+        try:
+            if not ts_codes:
+                return False, "❌ 股票代码列表为空", {}
+
+            results = {}
+            failed_codes = []
+            failure_msgs = []
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self.download_and_store, code, start_date, end_date): code
+                           for code in ts_codes}
+                for future in as_completed(futures):
+                    code = futures[future]
+                    try:
+                        success, message, df = future.result()
+                        if success:
+                            results[code] = df
+                        else:
+                            failed_codes.append(code)
+                            failure_msgs.append(f"❌ {code}: {message}")
+                    except Exception as e:
+                        failed_codes.append(code)
+                        failure_msgs.append(f"❌ {code}: 下载异常 - {str(e)}")
+
+            if failure_msgs:
+                print('\n'.join(failure_msgs))
+
+            message = f"✅ 批量下载完成：成功{len(results)}只，失败{len(failed_codes)}只"
+            if failed_codes:
+                message += f"\n失败股票：{', '.join(failed_codes[:10])}{'...' if len(failed_codes) > 10 else ''}"
+
+            return bool(results), message, results
+
+        except Exception as e:
+            return False, f"❌ 批量下载时发生错误：{str(e)}", {}
+
     def get_adj_factor(self, ts_code: str, start_date: str, end_date: str) -> pd.DataFrame:
         """
         获取复权因子
@@ -191,26 +357,51 @@ class TushareLoader:
             pd.DataFrame: 包含复权因子的DataFrame
         """
         try:
-            # 直接按日期范围获取复权因子，避免逐日调用API
-            df = ts.pro_api().adj_factor(ts_code=ts_code, start_date=start_date, end_date=end_date)
-            
-            if df is None or df.empty:
-                # 如果按范围获取失败，尝试不指定日期范围获取全部数据后筛选
-                df_all = ts.pro_api().adj_factor(ts_code=ts_code)
-                if df_all is not None and not df_all.empty:
-                    # 筛选日期范围内的数据
-                    df = df_all[
-                        (df_all['trade_date'] >= start_date) & 
-                        (df_all['trade_date'] <= end_date)
-                    ]
-            
+            # 区间命中缓存则直接返回，不发请求
+            key = (ts_code, start_date, end_date)
+            cached = self._adj_cache.get(key)
+            if cached is not None:
+                return cached.copy()
+
+            # 全量历史已缓存时本地切片即可（单只股票的因子表仅千行量级）；
+            # 内存未命中时先查磁盘缓存（跨进程复用全量历史）
+            full = self._adj_cache.get((ts_code, None, None))
+            if full is None:
+                full = _read_cached_parquet(
+                    os.path.join(_ADJ_FACTOR_CACHE_DIR, f"{ts_code}.parquet"))
+                if full is not None:
+                    self._adj_cache[(ts_code, None, None)] = full
+            if full is not None:
+                df = full[(full['trade_date'] >= start_date) & (full['trade_date'] <= end_date)]
+            else:
+                # 直接按日期范围获取复权因子，避免逐日调用API
+                _acquire_api_slot()
+                df = _pro_api().adj_factor(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+                if df is None or df.empty:
+                    # 如果按范围获取失败，尝试不指定日期范围获取全部数据后筛选；
+                    # 全量结果缓存起来，同一股票后续区间查询不再触发回退请求
+                    _acquire_api_slot()
+                    df_all = _pro_api().adj_factor(ts_code=ts_code)
+                    if df_all is not None and not df_all.empty:
+                        df_all = df_all.drop_duplicates().sort_values('trade_date')
+                        self._adj_cache[(ts_code, None, None)] = df_all
+                        _write_cached_parquet(
+                            os.path.join(_ADJ_FACTOR_CACHE_DIR, f"{ts_code}.parquet"), df_all)
+                        # 筛选日期范围内的数据
+                        df = df_all[
+                            (df_all['trade_date'] >= start_date) &
+                            (df_all['trade_date'] <= end_date)
+                        ]
+
             if df is None or df.empty:
                 raise ValueError(f"无法获取复权因子: {ts_code}")
-                
+
             # 去重并按日期排序
             df = df.drop_duplicates().sort_values('trade_date')
-            return df
-            
+            self._adj_cache[key] = df
+            return df.copy()
+
         except Exception as e:
             raise ValueError(f"获取复权因子失败: {str(e)}")
 
@@ -234,7 +425,8 @@ class TushareLoader:
             
             # Download index data using index_daily interface
             try:
-                df = ts.pro_api().index_daily(ts_code=ts_code, start_date=start, end_date=end)
+                _acquire_api_slot()
+                df = _pro_api().index_daily(ts_code=ts_code, start_date=start, end_date=end)
                 if df is None:
                     return False, f"❌ API返回空数据: {ts_code}", pd.DataFrame()
                 if df.empty:
@@ -247,58 +439,53 @@ class TushareLoader:
             
             # 重新排列列以匹配股票数据格式
             df = df[["trade_date", "ts_code", "open", "high", "low", "close", "vol", "amount", "adj_factor"]]
-            df = df.sort_values("trade_date")
+            df = df.sort_values("trade_date", kind="mergesort", ignore_index=True)
+
+            # 与股票数据相同：数值列一次性转float64，避免object列流入库内比对
+            numeric_cols = ["open", "high", "low", "close", "vol", "amount", "adj_factor"]
+            df[numeric_cols] = df[numeric_cols].astype(np.float64, copy=False)
             
             # Store in database (same logic as stock data)
-            new_records = []
-            
             try:
-                with self.db_manager.get_connection() as conn:
-                    for _, row in df.iterrows():
-                        trade_date = row["trade_date"]
-                        
-                        # Check for existing record
-                        existing = conn.execute("""
-                            SELECT trade_date, ts_code, open, high, low, close, vol, amount, adj_factor 
-                            FROM daily_data
-                            WHERE ts_code = ? AND trade_date = ?
-                        """, (ts_code, trade_date)).fetchone()
-                        
-                        if existing:
-                            # 将查询结果转换为字典，使用列名访问
-                            existing_dict = dict(zip(['trade_date', 'ts_code', 'open', 'high', 'low', 'close', 'vol', 'amount', 'adj_factor'], existing))
-                            
-                            # Compare fields
-                            db_row = {
-                                "open": round(float(existing_dict['open']), 6),
-                                "high": round(float(existing_dict['high']), 6),
-                                "low": round(float(existing_dict['low']), 6),
-                                "close": round(float(existing_dict['close']), 6),
-                                "vol": round(float(existing_dict['vol']), 6),
-                                "amount": round(float(existing_dict['amount']), 6),
-                                "adj_factor": round(float(existing_dict['adj_factor']), 6)
-                            }
-                            
-                            mem_row = {
-                                "open": round(float(row["open"]), 6),
-                                "high": round(float(row["high"]), 6),
-                                "low": round(float(row["low"]), 6),
-                                "close": round(float(row["close"]), 6),
-                                "vol": round(float(row["vol"]), 6),
-                                "amount": round(float(row["amount"]), 6),
-                                "adj_factor": round(float(row["adj_factor"]), 6)
-                            }
-                            
-                            if db_row != mem_row:
-                                return False, f"⚠️ 指数数据冲突：{ts_code} {trade_date} 不一致，数据库={db_row}, 下载={mem_row}", pd.DataFrame()
-                        else:
-                            new_records.append(row)
-                    
-                    # Insert new records
-                    if new_records:
-                        insert_df = pd.DataFrame(new_records)
-                        insert_df.to_sql("daily_data", conn, if_exists="append", index=False)
-                        return True, f"✅ 插入 {len(insert_df)} 条新指数记录：{ts_code}", insert_df
+                with self.db_manager.get_write_connection() as conn:
+                    # 冲突检测与去重下推到SQLite：下载结果灌入临时表后，
+                    # 一条JOIN在C层完成等值比对（阈值对应原先round到6位），
+                    # 一条INSERT OR IGNORE借主键约束只插入真正的新行——
+                    # 不再逐行SELECT+Python字典比较
+                    insert_df = df[["trade_date", "ts_code", "open", "high", "low", "close", "vol", "amount", "adj_factor"]]
+                    conn.execute("BEGIN")
+                    conn.execute("""
+                        CREATE TEMP TABLE IF NOT EXISTS _dl_daily (
+                            trade_date INTEGER, ts_code TEXT,
+                            open REAL, high REAL, low REAL, close REAL,
+                            vol REAL, amount REAL, adj_factor REAL
+                        )
+                    """)
+                    conn.execute("DELETE FROM _dl_daily")
+                    conn.executemany(
+                        "INSERT INTO _dl_daily VALUES (?,?,?,?,?,?,?,?,?)",
+                        insert_df.itertuples(index=False, name=None)
+                    )
+
+                    conflict = conn.execute("""
+                        SELECT t.trade_date FROM _dl_daily t
+                        JOIN daily_data d ON d.ts_code = t.ts_code AND d.trade_date = t.trade_date
+                        WHERE abs(d.open - t.open) > 1e-6 OR abs(d.high - t.high) > 1e-6
+                           OR abs(d.low - t.low) > 1e-6 OR abs(d.close - t.close) > 1e-6
+                           OR abs(d.vol - t.vol) > 1e-6 OR abs(d.amount - t.amount) > 1e-6
+                           OR abs(d.adj_factor - t.adj_factor) > 1e-6
+                        LIMIT 1
+                    """).fetchone()
+                    if conflict:
+                        return False, f"⚠️ 指数数据冲突：{ts_code} {conflict[0]} 与数据库不一致", pd.DataFrame()
+
+                    changes_before = conn.total_changes
+                    conn.execute("INSERT OR IGNORE INTO daily_data SELECT * FROM _dl_daily")
+                    inserted = conn.total_changes - changes_before
+                    conn.commit()
+
+                    if inserted:
+                        return True, f"✅ 插入 {inserted} 条新指数记录：{ts_code}", df
                     else:
                         return True, f"✅ 无需插入，指数数据一致：{ts_code}", df
             except Exception as db_error:
@@ -332,42 +519,51 @@ class TushareLoader:
             except Exception as calendar_error:
                 return False, f"❌ 获取交易日历失败：{str(calendar_error)}", pd.DataFrame()
             
-            all_moneyflow_data = []
             successful_days = 0
             failed_days = 0
-            
-            # 按日期逐天获取资金流数据
-            for _, day_row in trading_days.iterrows():
-                trade_date = day_row['cal_date']
-                
-                try:
-                    # 获取当日资金流数据
-                    daily_df = ts.pro_api().moneyflow(
-                        trade_date=trade_date,
-                        fields="ts_code,trade_date,buy_elg_amount,buy_elg_vol"
-                    )
-                    
-                    if daily_df is not None and not daily_df.empty:
-                        all_moneyflow_data.append(daily_df)
-                        successful_days += 1
-                        print(f"✅ 成功获取 {trade_date} 资金流数据：{len(daily_df)} 条记录")
-                    else:
+
+            # 并发抓取各交易日的资金流数据：每次调用都是数百毫秒的HTTP往返，
+            # 网络等待期间GIL释放，线程池并行发起（提交速率受全局令牌桶限流）
+            def _fetch_day(trade_date):
+                _acquire_api_slot()
+                return _pro_api().moneyflow(
+                    trade_date=trade_date,
+                    fields="ts_code,trade_date,buy_elg_amount,buy_elg_vol"
+                )
+
+            failure_msgs = []
+            results_by_day = {}
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = {executor.submit(_fetch_day, d): d for d in trading_days['cal_date']}
+                for future in as_completed(futures):
+                    trade_date = futures[future]
+                    try:
+                        daily_df = future.result()
+                        if daily_df is not None and not daily_df.empty:
+                            # 每日小帧先按ts_code稳定排序（O(M log M)），
+                            # 再按日历序拼接即全局有序，免去对整表的O(N log N)重排
+                            results_by_day[trade_date] = daily_df.sort_values('ts_code', kind='mergesort')
+                            successful_days += 1
+                        else:
+                            failed_days += 1
+                            failure_msgs.append(f"⚠️ {trade_date} 无资金流数据")
+                    except Exception as daily_error:
                         failed_days += 1
-                        print(f"⚠️ {trade_date} 无资金流数据")
-                        
-                except Exception as daily_error:
-                    failed_days += 1
-                    print(f"❌ {trade_date} 资金流数据获取失败：{str(daily_error)}")
-                    continue
+                        failure_msgs.append(f"❌ {trade_date} 资金流数据获取失败：{str(daily_error)}")
+            if failure_msgs:
+                print('\n'.join(failure_msgs))
+
+            # 并发返回顺序不定：按交易日历顺序重组各日结果
+            all_moneyflow_data = [results_by_day[d] for d in trading_days['cal_date']
+                                  if d in results_by_day]
             
             if not all_moneyflow_data:
                 return False, f"❌ 无法获取任何资金流数据：{start} 到 {end}", pd.DataFrame()
             
-            # 合并所有数据
+            # 合并所有数据（各日内部已排序、整体按日历序拼接，无需全局重排）
             try:
-                combined_df = pd.concat(all_moneyflow_data, ignore_index=True)
-                combined_df = combined_df.sort_values(['trade_date', 'ts_code'])
-                
+                combined_df = pd.concat(all_moneyflow_data, ignore_index=True, copy=False)
+
                 # 确保数据列完整
                 required_columns = ['ts_code', 'trade_date', 'buy_elg_amount', 'buy_elg_vol']
                 for col in required_columns:
@@ -380,58 +576,55 @@ class TushareLoader:
                 return False, f"❌ 合并资金流数据失败：{str(combine_error)}", pd.DataFrame()
             
             # 存储到数据库
-            new_records = []
-            conflict_records = 0
-            
             try:
-                with self.db_manager.get_connection() as conn:
-                    for _, row in combined_df.iterrows():
-                        ts_code = row["ts_code"]
-                        trade_date = row["trade_date"]
-                        
-                        # 检查是否已存在记录
-                        existing = conn.execute("""
-                            SELECT ts_code, trade_date, buy_elg_amount, buy_elg_vol 
-                            FROM moneyflow_data
-                            WHERE ts_code = ? AND trade_date = ?
-                        """, (ts_code, trade_date)).fetchone()
-                        
-                        if existing:
-                            # 将查询结果转换为字典，使用列名访问
-                            existing_dict = dict(zip(['ts_code', 'trade_date', 'buy_elg_amount', 'buy_elg_vol'], existing))
-                            
-                            # 比较字段
-                            db_row = {
-                                "buy_elg_amount": round(float(existing_dict['buy_elg_amount'] or 0), 6),
-                                "buy_elg_vol": round(float(existing_dict['buy_elg_vol'] or 0), 6)
-                            }
-                            
-                            mem_row = {
-                                "buy_elg_amount": round(float(row["buy_elg_amount"] or 0), 6),
-                                "buy_elg_vol": round(float(row["buy_elg_vol"] or 0), 6)
-                            }
-                            
-                            if db_row != mem_row:
-                                conflict_records += 1
-                                print(f"⚠️ 资金流数据冲突：{ts_code} {trade_date}")
-                        else:
-                            new_records.append(row)
-                    
+                with self.db_manager.get_write_connection() as conn:
+                    # 单条范围查询取回库内已有行，merge后向量化比对：
+                    # 去掉iterrows逐行装箱Series和每格float()+round()的解释器开销
+                    existing = pd.read_sql_query(
+                        "SELECT trade_date, ts_code, buy_elg_amount, buy_elg_vol "
+                        "FROM moneyflow_data WHERE trade_date BETWEEN ? AND ?",
+                        conn, params=(start, end))
+
+                    merged = combined_df.merge(existing, on=["trade_date", "ts_code"],
+                                               how="left", suffixes=("", "_db"), indicator=True,
+                                               validate="one_to_one")
+                    in_db = (merged['_merge'] == 'both').to_numpy()
+
+                    value_cols = ["buy_elg_amount", "buy_elg_vol"]
+                    new_vals = merged[value_cols].fillna(0).to_numpy(dtype=np.float64)
+                    db_vals = merged[[c + '_db' for c in value_cols]].fillna(0).to_numpy(dtype=np.float64)
+
+                    conflict = in_db & diff_mask(new_vals, db_vals, 1e-6)
+                    conflict_records = int(conflict.sum())
+                    if conflict_records:
+                        conflict_rows = merged.loc[conflict, ['ts_code', 'trade_date']].head(20)
+                        lines = '\n'.join(f"⚠️ 资金流数据冲突：{r.ts_code} {r.trade_date}"
+                                          for r in conflict_rows.itertuples(index=False))
+                        suffix = f"\n⚠️ ...等{conflict_records}条冲突记录" if conflict_records > 20 else ''
+                        print(lines + suffix)
+
                     # 插入新记录
-                    if new_records:
-                        insert_df = pd.DataFrame(new_records)
-                        insert_df.to_sql("moneyflow_data", conn, if_exists="append", index=False)
-                        
+                    if not in_db.all():
+                        insert_df = combined_df.loc[~in_db]
+                        # 与日线数据相同：单事务executemany批量插入，
+                        # 避免to_sql逐行INSERT的SQL解析和fsync开销
+                        rows = insert_df[["trade_date", "ts_code", "buy_elg_amount", "buy_elg_vol"]]
+                        conn.execute("BEGIN")
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO moneyflow_data (trade_date, ts_code, buy_elg_amount, buy_elg_vol) VALUES (?,?,?,?)",
+                            rows.itertuples(index=False, name=None))
+                        conn.commit()
+
                         success_msg = f"✅ 资金流数据获取成功：成功{successful_days}天，失败{failed_days}天，插入{len(insert_df)}条新记录"
                         if conflict_records > 0:
                             success_msg += f"，发现{conflict_records}条冲突记录"
-                        
+
                         return True, success_msg, insert_df
                     else:
                         success_msg = f"✅ 资金流数据一致：成功{successful_days}天，失败{failed_days}天，无需插入新记录"
                         if conflict_records > 0:
                             success_msg += f"，发现{conflict_records}条冲突记录"
-                        
+
                         return True, success_msg, combined_df
                         
             except Exception as db_error:
@@ -448,29 +641,27 @@ class TushareLoader:
             Tuple[bool, str, pd.DataFrame]: (success status, message, stock list)
         """
         try:
-            # 获取在市股票
-            all_stocks_1 = ts.pro_api().stock_basic(
-                exchange='', 
-                list_status='L', 
-                fields='ts_code,symbol,name,area,industry,list_date'
-            )
-            
-            # 获取退市股票  
-            all_stocks_2 = ts.pro_api().stock_basic(
-                exchange='', 
-                list_status='D', 
-                fields='ts_code,symbol,name,area,industry,list_date'
-            )
-            
-            # 获取暂停上市股票
-            all_stocks_3 = ts.pro_api().stock_basic(
-                exchange='', 
-                list_status='P', 
-                fields='ts_code,symbol,name,area,industry,list_date'
-            )
-            
+            # 股票列表是低频变动的参考表：磁盘缓存当天有效，
+            # 命中时三次stock_basic网络请求全部省掉
+            cached = self._read_stock_basic_cache()
+            if cached is not None:
+                return True, "✅ 获取股票基本信息成功（磁盘缓存）", cached
+
+            # 在市/退市/暂停上市三个列表互相独立：并发请求，
+            # 总耗时从三次往返之和降为最慢一次
+            def _fetch_status(list_status):
+                _acquire_api_slot()
+                return _pro_api().stock_basic(
+                    exchange='',
+                    list_status=list_status,
+                    fields='ts_code,symbol,name,area,industry,list_date'
+                )
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [executor.submit(_fetch_status, s) for s in ('L', 'D', 'P')]
+                dataframes = [future.result() for future in futures]
+
             # 检查数据有效性
-            dataframes = [all_stocks_1, all_stocks_2, all_stocks_3]
             valid_dataframes = []
             
             for df in dataframes:
@@ -483,23 +674,46 @@ class TushareLoader:
             # 合并所有股票数据
             combined_stocks = pd.concat(valid_dataframes, ignore_index=True)
             
-            # 排除ST股票
-            combined_stocks = combined_stocks[~combined_stocks["name"].str.contains("ST", na=False)]
-            
-            # 排除北交所股票（.BJ结尾）
-            combined_stocks = combined_stocks[~combined_stocks["ts_code"].str.contains(".BJ", na=False)]
-            
-            # 去重并排序
-            stock_codes = sorted(set(combined_stocks['ts_code'].values))
-            
+            # 两个排除条件合成一个掩码后切片一次，而不是连续两次重建整帧：
+            # ST股（regex=False走纯子串匹配）与北交所股（.BJ结尾；
+            # 原先的str.contains把"."当正则通配符用）
+            keep = (~combined_stocks["name"].str.contains("ST", na=False, regex=False)
+                    & ~combined_stocks["ts_code"].str.endswith(".BJ", na=False))
+            combined_stocks = combined_stocks.loc[keep]
+
+            # 去重并排序（C层排序去重，不经set()+sorted()的Python对象往返）
+            stock_codes = combined_stocks['ts_code'].sort_values(kind='mergesort').drop_duplicates()
+
             # 返回股票代码列表
-            result_df = pd.DataFrame({'ts_code': stock_codes})
-            
+            result_df = stock_codes.reset_index(drop=True).to_frame()
+
+            self._write_stock_basic_cache(result_df)
+
             return True, f"✅ 获取股票基本信息成功", result_df
-            
+
         except Exception as e:
             return False, f"❌ 获取股票基本信息失败：{str(e)}", pd.DataFrame()
 
+    def _read_stock_basic_cache(self) -> Optional[pd.DataFrame]:
+        """读取当天写入的股票列表缓存，过期（超过一天）或不存在时返回None"""
+        try:
+            if not os.path.exists(_STOCK_BASIC_CACHE_PATH):
+                return None
+            if time.time() - os.path.getmtime(_STOCK_BASIC_CACHE_PATH) > 86400:
+                return None
+            df = pd.read_parquet(_STOCK_BASIC_CACHE_PATH)
+            return df if not df.empty else None
+        except Exception:
+            return None
+
+    def _write_stock_basic_cache(self, df: pd.DataFrame):
+        """将股票列表写入磁盘缓存"""
+        try:
+            os.makedirs(os.path.dirname(_STOCK_BASIC_CACHE_PATH), exist_ok=True)
+            df.to_parquet(_STOCK_BASIC_CACHE_PATH, index=False)
+        except Exception as e:
+            print(f"⚠️ 股票列表缓存写入失败：{str(e)}")
+
     def get_daily_basic_data(self, trade_date: str, ts_code: Optional[str] = None) -> Tuple[bool, str, pd.DataFrame]:
         """
         获取指定交易日的股票基本信息（包含流通市值等）
@@ -513,7 +727,8 @@ class TushareLoader:
         """
         try:
             # 调用Tushare的每日基本信息接口
-            daily_basic = ts.pro_api().daily_basic(
+            _acquire_api_slot()
+            daily_basic = _pro_api().daily_basic(
                 trade_date=trade_date,
                 ts_code=ts_code,
                 fields='ts_code,trade_date,close,turnover_rate,volume_ratio,pe,pb,ps,dv_ratio,dv_ttm,total_share,float_share,free_share,total_mv,circ_mv'
@@ -532,10 +747,51 @@ class TushareLoader:
             daily_basic = daily_basic.sort_values(['ts_code'])
             
             return True, f"✅ 获取{trade_date}每日基本信息成功", daily_basic
-            
+
         except Exception as e:
             return False, f"❌ 获取{trade_date}每日基本信息失败：{str(e)}", pd.DataFrame()
 
+    def get_daily_basic_data_many(self, trade_dates: list, ts_code: Optional[str] = None,
+                                  max_workers: int = 8) -> Tuple[bool, str, dict]:
+        """
+        并发获取多个交易日的每日基本信息
+
+        每个交易日一次网络请求，串行下载时延迟按天数线性累加；
+        这里用线程池并发请求（限流由_acquire_api_slot统一把关）
+
+        Args:
+            trade_dates: 交易日期列表，格式：YYYYMMDD
+            ts_code: 股票代码（可选），如果不指定则获取所有股票
+            max_workers: 并发线程数
+
+        Returns:
+            Tuple[bool, str, dict]: (success status, message, {trade_date: DataFrame})
+        """
+        results: dict = {}
+        failure_msgs = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.get_daily_basic_data, trade_date, ts_code): trade_date
+                       for trade_date in trade_dates}
+            for future in as_completed(futures):
+                trade_date = futures[future]
+                try:
+                    success, message, daily_basic = future.result()
+                    if success:
+                        results[trade_date] = daily_basic
+                    else:
+                        failure_msgs.append(message)
+                except Exception as e:
+                    failure_msgs.append(f"❌ 获取{trade_date}每日基本信息失败：{str(e)}")
+
+        if failure_msgs:
+            print("\n".join(failure_msgs))
+
+        if not results:
+            return False, "❌ 所有交易日的每日基本信息获取均失败", {}
+
+        return True, f"✅ 获取每日基本信息成功：{len(results)}/{len(trade_dates)} 个交易日", results
+
 # Example usage
 if __name__ == "__main__":
     loader = TushareLoader()